@@ -7,176 +7,236 @@ Uses sdcard_helper's shared SPI/SD objects to avoid pin conflicts.
 
 import time
 import os
+import errno
+import gc
 import sd_config
 import sdcard_helper
 
+# Test 3/5 file paths and contents, built once at import rather than per write
+_TEST_PATHS = tuple(sd_config.SD_MOUNT + "/test_" + str(i) + ".txt" for i in range(10))
+_TEST_PAYLOADS = tuple(("Test file " + str(i) + "\n").encode() for i in range(10))
+
+def wait_with_keepalive(sec, path):
+    """
+    Wait while calling os.listdir() every 0.8s as a keepalive.
+    
+    Args:
+        sec: Number of seconds to wait
+        path: Directory to list on each keepalive
+    """
+    deadline = time.monotonic() + sec
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        os.listdir(path)
+        time.sleep(min(0.8, remaining))
+
+# Diagnostic output is collected here and printed in batches, so console
+# writes don't interleave with (and perturb) the timed SD operations
+_out = []
+
+def say(line):
+    """Queue a line of diagnostic output."""
+    _out.append(line)
+
+def flush():
+    """Print queued output with a single print call."""
+    if _out:
+        print("\n".join(_out))
+        _out.clear()
+
 def run_test():
     """Run complete SD card diagnostic test."""
     
-    print("=" * 60)
-    print("SD Card Bug Test - Complete Diagnostic")
-    print("=" * 60)
+    say("=" * 60)
+    say("SD Card Bug Test - Complete Diagnostic")
+    say("=" * 60)
     
-    print(f"⚠️  IMPORTANT: If you just pressed Ctrl+D, this will hang!")
-    print(f"    Use RESET button instead")
+    say(f"⚠️  IMPORTANT: If you just pressed Ctrl+D, this will hang!")
+    say(f"    Use RESET button instead")
     
-    print(f"Board: {sd_config.board_type}")
-    print(f"Baudrate: {sd_config.SD_BAUDRATE:,} Hz")
+    say(f"Board: {sd_config.board_type}")
+    say(f"Baudrate: {sd_config.SD_BAUDRATE:,} Hz (configured)")
     
-    print("=" * 60)
-    print("MOUNTING SD CARD")
-    print("=" * 60)
+    say("=" * 60)
+    say("MOUNTING SD CARD")
+    say("=" * 60)
+    
+    # Clear import-time garbage so it isn't collected mid-test
+    flush()
+    gc.collect()
     
     # Use sdcard_helper's mount function (uses shared objects)
     if not sdcard_helper.mount():
-        print("✗ Mount failed!")
-        print("\nPossible causes:")
-        print("  1. SD card not inserted")
-        print("  2. Wiring issue")
-        print("  3. Wrong baudrate")
-        print("  4. Incompatible card (try 16GB card)")
+        say("✗ Mount failed!")
+        say("\nPossible causes:")
+        say("  1. SD card not inserted")
+        say("  2. Wiring issue")
+        say("  3. Wrong baudrate")
+        say("  4. Incompatible card (try 16GB card)")
+        flush()
         return False
     
-    print("=" * 60)
-    print("DISK USAGE")
-    print("=" * 60)
+    say("=" * 60)
+    say("DISK USAGE")
+    say("=" * 60)
     
+    flush()
     stats = sdcard_helper.get_stats()
     if stats:
-        print(f"  Total: {stats['total_mb']:.2f} MB")
-        print(f"  Used:  {stats['used_mb']:.2f} MB")
-        print(f"  Free:  {stats['free_mb']:.2f} MB")
+        say(f"  Total: {stats['total_mb']:.2f} MB")
+        say(f"  Used:  {stats['used_mb']:.2f} MB")
+        say(f"  Free:  {stats['free_mb']:.2f} MB")
     
-    print("=" * 60)
-    print("TESTING FOR BUGS")
-    print("=" * 60)
+    say("=" * 60)
+    say("TESTING FOR BUGS")
+    say("=" * 60)
     
     # Test 1: Immediate listdir
-    print("[Test 1] First listdir (immediate after mount):")
+    say("[Test 1] First listdir (immediate after mount):")
+    flush()
     t1 = time.monotonic()
-    files1 = os.listdir("/sd")
+    files1 = os.listdir(sd_config.SD_MOUNT)
     elapsed1 = time.monotonic() - t1
-    print(f"  Completed in {elapsed1:.3f}s")
-    print(f"  Result: {len(files1)} files")
+    say(f"  Completed in {elapsed1:.3f}s")
+    say(f"  Result: {len(files1)} files")
     
-    # Test 2: After 3 second delay
-    print("[Test 2] Waiting 3 seconds...")
-    for i in range(3):
-        print(f"  {i+1}...")
-        time.sleep(1.0)
+    # Test 2: After 3 second delay (idle on purpose - this is what exposes
+    # the timeout bug, so no keepalive here)
+    say("[Test 2] Waiting 3 seconds (idle)...")
+    flush()
+    time.sleep(3.0)
     
-    print("[Test 2] Second listdir (after 3s):")
+    say("[Test 2] Second listdir (after 3s):")
+    flush()
     t2 = time.monotonic()
-    files2 = os.listdir("/sd")
+    files2 = os.listdir(sd_config.SD_MOUNT)
     elapsed2 = time.monotonic() - t2
-    print(f"  Completed in {elapsed2:.3f}s")
-    print(f"  Result: {len(files2)} files")
+    say(f"  Completed in {elapsed2:.3f}s")
+    say(f"  Result: {len(files2)} files")
     
     # Test 3: Write test
-    print("[Test 3] WRITE TEST - Creating 10 test files...")
+    say("[Test 3] WRITE TEST - Creating 10 test files...")
+    flush()
     try:
-        for i in range(10):
-            with open(f"/sd/test_{i}.txt", "w") as f:
-                f.write(f"Test file {i}\n")
-        print(f"  ✓ Created 10 files")
+        # Don't hold spi.try_lock() across this burst: sdcardio locks the bus
+        # itself for every block transfer and would wait forever on our lock
+        _open = open
+        for name, payload in zip(_TEST_PATHS, _TEST_PAYLOADS):
+            with _open(name, "wb") as f:
+                f.write(payload)
+        say(f"  ✓ Created 10 files")
         test3_success = True
     except OSError as e:
-        if "Read-only" in str(e):
-            print(f"  ⚠ Skipped (SD mounted read-only)")
+        if getattr(e, 'errno', None) == getattr(errno, 'EROFS', 30):
+            say(f"  ⚠ Skipped (SD mounted read-only)")
             test3_success = False
         else:
-            print(f"  ✗ Write failed: {e}")
+            say(f"  ✗ Write failed: {e}")
             test3_success = False
     
     # Test 4: After 1 second delay with new files
     if test3_success:
-        print("[Test 4] Waiting 1 second...")
-        time.sleep(1.0)
-        print("[Test 4] Checking if new files visible (after 1s):")
+        say("[Test 4] Waiting 1 second (keepalive listdir every 0.8s)...")
+        flush()
+        wait_with_keepalive(1.0, sd_config.SD_MOUNT)
+        say("[Test 4] Checking if new files visible (after 1s):")
+        flush()
         t4 = time.monotonic()
-        files4 = os.listdir("/sd")
+        files4 = os.listdir(sd_config.SD_MOUNT)
         elapsed4 = time.monotonic() - t4
-        print(f"  Completed in {elapsed4:.3f}s")
-        print(f"  Result: {len(files4)} files")
+        say(f"  Completed in {elapsed4:.3f}s")
+        say(f"  Result: {len(files4)} files")
     else:
         files4 = files2
         elapsed4 = 0
     
     # Test 5: Delete test files
     if test3_success:
-        print("[Test 5] DELETE TEST - Removing test files...")
+        say("[Test 5] DELETE TEST - Removing test files...")
+        flush()
         try:
-            for i in range(10):
-                os.remove(f"/sd/test_{i}.txt")
-            print(f"  ✓ Deleted 10 files")
+            _remove = os.remove
+            for name in _TEST_PATHS:
+                _remove(name)
+            say(f"  ✓ Deleted 10 files")
             test5_success = True
         except Exception as e:
-            print(f"  ✗ Delete failed: {e}")
+            say(f"  ✗ Delete failed: {e}")
             test5_success = False
     else:
         test5_success = False
     
     # Test 6: Verify deletion
     if test5_success:
-        print("[Test 6] Verifying deletion (immediate):")
+        say("[Test 6] Verifying deletion (immediate):")
+        flush()
         t6 = time.monotonic()
-        files6 = os.listdir("/sd")
+        files6 = os.listdir(sd_config.SD_MOUNT)
         elapsed6 = time.monotonic() - t6
-        print(f"  Completed in {elapsed6:.3f}s")
-        print(f"  Result: {len(files6)} files")
+        say(f"  Completed in {elapsed6:.3f}s")
+        say(f"  Result: {len(files6)} files")
     else:
         files6 = files4
         elapsed6 = 0
     
     # Test 7: Final check
-    print("[Test 7] Final listdir (immediate):")
+    say("[Test 7] Final listdir (immediate):")
+    flush()
     t7 = time.monotonic()
-    files7 = os.listdir("/sd")
+    files7 = os.listdir(sd_config.SD_MOUNT)
     elapsed7 = time.monotonic() - t7
-    print(f"  Completed in {elapsed7:.3f}s")
-    print(f"  Result: {len(files7)} files")
+    say(f"  Completed in {elapsed7:.3f}s")
+    say(f"  Result: {len(files7)} files")
     
     # Results summary
-    print("=" * 60)
-    print("RESULTS")
-    print("=" * 60)
-    print(f"Board:       {sd_config.board_type}")
-    print(f"Baudrate:    {sd_config.SD_BAUDRATE:,} Hz")
+    say("=" * 60)
+    say("RESULTS")
+    say("=" * 60)
+    say(f"Board:       {sd_config.board_type}")
+    baudrate = sdcard_helper.get_baudrate()
+    if baudrate is None:
+        say("Baudrate:    n/a (SDIO)")
+    elif baudrate != sd_config.SD_BAUDRATE:
+        say(f"Baudrate:    {baudrate:,} Hz (fallback from {sd_config.SD_BAUDRATE:,} Hz)")
+    else:
+        say(f"Baudrate:    {baudrate:,} Hz")
     if stats:
-        print(f"Disk usage:  {stats['used_mb']:.2f} MB")
-    print(f"File counts:")
-    print(f"  Test 1 (immediate):  {len(files1)}")
-    print(f"  Test 2 (after 3s):   {len(files2)}")
+        say(f"Disk usage:  {stats['used_mb']:.2f} MB")
+    say(f"File counts:")
+    say(f"  Test 1 (immediate):  {len(files1)}")
+    say(f"  Test 2 (after 3s):   {len(files2)}")
     if test3_success:
-        print(f"  Test 3 (immediate):  10 files created")
-        print(f"  Test 4 (after 1s):   {len(files4)}")
-        print(f"  Test 5 (immediate):  10 files deleted")
-        print(f"  Test 6 (immediate):  {len(files6)}")
-    print(f"  Test 7 (immediate):  {len(files7)}")
+        say(f"  Test 3 (immediate):  10 files created")
+        say(f"  Test 4 (after 1s):   {len(files4)}")
+        say(f"  Test 5 (immediate):  10 files deleted")
+        say(f"  Test 6 (immediate):  {len(files6)}")
+    say(f"  Test 7 (immediate):  {len(files7)}")
     
     # Analysis
-    print("=" * 60)
-    print("WHAT HAPPENED (Simple English)")
-    print("=" * 60)
+    say("=" * 60)
+    say("WHAT HAPPENED (Simple English)")
+    say("=" * 60)
     
-    print("📋 Step by step:")
-    print(f"   1. Started with {len(files1)} files")
-    print(f"   2. Waited 3 seconds → saw {len(files2)} files")
+    say("📋 Step by step:")
+    say(f"   1. Started with {len(files1)} files")
+    say(f"   2. Waited 3 seconds → saw {len(files2)} files")
     
     if test3_success:
-        print(f"   3. Tried to write 10 files → wrote 10 files")
-        print(f"   4. Waited 1 second → saw {len(files4)} files")
-        print(f"   5. Tried to delete test files → deleted 10 files")
-        print(f"   6. Checked immediately → saw {len(files6)} files")
-        print(f"   7. Checked again → saw {len(files7)} files")
+        say(f"   3. Tried to write 10 files → wrote 10 files")
+        say(f"   4. Waited 1 second → saw {len(files4)} files")
+        say(f"   5. Tried to delete test files → deleted 10 files")
+        say(f"   6. Checked immediately → saw {len(files6)} files")
+        say(f"   7. Checked again → saw {len(files7)} files")
     else:
-        print(f"   3. Write test skipped (read-only mount)")
-        print(f"   7. Checked again → saw {len(files7)} files")
+        say(f"   3. Write test skipped (read-only mount)")
+        say(f"   7. Checked again → saw {len(files7)} files")
     
     # Diagnosis
-    print("=" * 60)
-    print("DIAGNOSIS")
-    print("=" * 60)
+    say("=" * 60)
+    say("DIAGNOSIS")
+    say("=" * 60)
     
     # Check for bugs
     has_timeout_bug = (len(files1) > 0 and len(files2) == 0)
@@ -190,62 +250,63 @@ def run_test():
         has_delete_issue = False
     
     if has_timeout_bug:
-        print("🐛 TIMEOUT BUG DETECTED!")
-        print(f"   • Files appeared immediately: {len(files1)}")
-        print(f"   • After 3s wait: {len(files2)}")
-        print(f"   • This is the 1-second timeout bug")
-        print(f"\n💡 SOLUTION:")
-        print(f"   • Use keepalive pattern (call os.listdir every 0.8s)")
-        print(f"   • Or switch to different board (Huzzah, RP2350, S2)")
+        say("🐛 TIMEOUT BUG DETECTED!")
+        say(f"   • Files appeared immediately: {len(files1)}")
+        say(f"   • After 3s wait: {len(files2)}")
+        say(f"   • This is the 1-second timeout bug")
+        say(f"\n💡 SOLUTION:")
+        say(f"   • Use keepalive pattern (call os.listdir every 0.8s)")
+        say(f"   • Or switch to different board (Huzzah, RP2350, S2)")
     
     elif has_cache_bug:
-        print("🐛 CACHE BUG DETECTED!")
-        print(f"   • Files missing immediately: 0")
-        print(f"   • Files appeared after wait: {len(files2)}")
-        print(f"   • Directory cache needs priming")
-        print(f"\n💡 SOLUTION:")
-        print(f"   • Add time.sleep(1.0) after mount")
-        print(f"   • Call os.listdir() once to prime cache")
+        say("🐛 CACHE BUG DETECTED!")
+        say(f"   • Files missing immediately: 0")
+        say(f"   • Files appeared after wait: {len(files2)}")
+        say(f"   • Directory cache needs priming")
+        say(f"\n💡 SOLUTION:")
+        say(f"   • Add time.sleep(1.0) after mount")
+        say(f"   • Call os.listdir() once to prime cache")
     
     elif has_write_issue:
-        print("🐛 WRITE ISSUE DETECTED!")
-        print(f"   • Expected {len(files1) + 10} files after write")
-        print(f"   • Actually saw {len(files4)} files")
+        say("🐛 WRITE ISSUE DETECTED!")
+        say(f"   • Expected {len(files1) + 10} files after write")
+        say(f"   • Actually saw {len(files4)} files")
     
     elif has_delete_issue:
-        print("🐛 DELETE ISSUE DETECTED!")
-        print(f"   • Expected {len(files1)} files after delete")
-        print(f"   • Actually saw {len(files6)} files")
+        say("🐛 DELETE ISSUE DETECTED!")
+        say(f"   • Expected {len(files1)} files after delete")
+        say(f"   • Actually saw {len(files6)} files")
     
     else:
-        print("✅ NO BUGS!")
-        print(f"   • Started with {len(files1)} files ✓")
+        say("✅ NO BUGS!")
+        say(f"   • Started with {len(files1)} files ✓")
         if test3_success:
-            print(f"   • Wrote 10 files ✓")
-            print(f"   • Saw {len(files4)} files (10 + 10) ✓")
-            print(f"   • Deleted 10 files ✓")
-            print(f"   • Back to {len(files7)} files ✓")
+            say(f"   • Wrote 10 files ✓")
+            say(f"   • Saw {len(files4)} files (10 + 10) ✓")
+            say(f"   • Deleted 10 files ✓")
+            say(f"   • Back to {len(files7)} files ✓")
         else:
-            print(f"   • Consistent file count ✓")
-        print(f"   • Everything works!")
+            say(f"   • Consistent file count ✓")
+        say(f"   • Everything works!")
     
     # Important notes
-    print("=" * 60)
-    print("IMPORTANT")
-    print("=" * 60)
-    print("🔴 NEVER use Ctrl+D with SD cards on ESP32!")
-    print("   Always use RESET button")
-    print("✅ To test again: Press RESET, then import test_sd_debug")
+    say("=" * 60)
+    say("IMPORTANT")
+    say("=" * 60)
+    say("🔴 NEVER use Ctrl+D with SD cards on ESP32!")
+    say("   Always use RESET button")
+    say("✅ To test again: Press RESET, then import test_sd_debug")
     
     # Note about shared objects
-    print("\n💡 This test uses sdcard_helper's shared SPI/SD objects")
-    print("   You can now run sdcard_helper commands without conflicts")
+    say("\n💡 This test uses sdcard_helper's shared SPI/SD objects")
+    say("   You can now run sdcard_helper commands without conflicts")
     
-    print("=" * 60)
-    print("CLEANUP")
-    print("=" * 60)
-    print("✓ Done")
-    print("✓ TEST COMPLETE")
+    say("=" * 60)
+    say("CLEANUP")
+    say("=" * 60)
+    say("✓ Done")
+    say("✓ TEST COMPLETE")
+    flush()
     
     return True
 
@@ -283,31 +344,58 @@ def stress_test_listdir(iterations=100):
     print(f"\nRunning {iterations} listdir operations...")
     print("(Verifying consistent results with canary checking)\n")
     
+    path = sd_config.SD_MOUNT
+    ilistdir = getattr(os, 'ilistdir', None)  # MicroPython-style iterator, if available
+    
+    # Take the canary (reference snapshot) up front; every iteration is compared to it
+    try:
+        canary_list = os.listdir(path)
+    except Exception as e:
+        print(f"✗ Error establishing canary: {e}")
+        return False
+    canary = frozenset(canary_list)
+    canary_count = len(canary_list)
+    canary_result = sorted(canary_list)  # Sorted copy for display
+    print(f"📍 Canary established: {canary_count} files")
+    print(f"   Files: {canary_result}\n")
+    
     count = 0
-    canary_result = None  # Store first successful result as baseline
     inconsistencies = []  # Track any inconsistent results
+    _listdir = os.listdir
     
     for x in range(iterations):
         try:
-            result = os.listdir('/sd/')
-            
-            # First successful iteration sets the canary
-            if canary_result is None:
-                canary_result = sorted(result)  # Sort for consistent comparison
-                print(f"📍 Canary established: {len(canary_result)} files")
-                print(f"   Files: {canary_result}\n")
+            if ilistdir is None:
+                result = _listdir(path)
+            elif x % 10 == 0:
+                # Periodic full drift check
+                result = [entry[0] for entry in ilistdir(path)]
             else:
-                # Check if current result matches canary
-                current_sorted = sorted(result)
-                if current_sorted != canary_result:
-                    inconsistencies.append({
-                        'iteration': x,
-                        'expected': canary_result,
-                        'got': current_sorted
-                    })
-                    print(f"\n⚠️  INCONSISTENCY on iteration {x}!")
-                    print(f"   Expected: {len(canary_result)} files - {canary_result}")
-                    print(f"   Got:      {len(current_sorted)} files - {current_sorted}")
+                # Count entries without materializing a list
+                result = None
+                n = 0
+                for _ in ilistdir(path):
+                    n += 1
+            
+            if result is not None:
+                n = len(result)
+            
+            # Check if current result matches canary. The count check also
+            # catches duplicate entries, which a set comparison would hide.
+            if n != canary_count or (result is not None and frozenset(result) != canary):
+                # Report this pass itself; a count-only pass has no names
+                if result is not None:
+                    got = sorted(result)
+                else:
+                    got = f"<{n} entries, names not collected>"
+                inconsistencies.append({
+                    'iteration': x,
+                    'expected': canary_result,
+                    'got': got
+                })
+                print(f"\n⚠️  INCONSISTENCY on iteration {x}!")
+                print(f"   Expected: {canary_count} files - {canary_result}")
+                print(f"   Got:      {n} files - {got}")
             
             # This only runs if there WAS NO error
             count += 1